@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, UploadFile, File
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -7,19 +7,22 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from typing import List, Dict, Any, Optional
 import uuid
 from datetime import datetime
 import asyncio
-import json
+import orjson
 import yt_dlp
+from yt_dlp.postprocessor import PostProcessor
 import aiofiles
 import threading
 from concurrent.futures import ThreadPoolExecutor
 import subprocess
 import time
 import re
+import zlib
+import mimetypes
 import shutil
 
 ROOT_DIR = Path(__file__).parent
@@ -27,19 +30,40 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=5,
+    maxIdleTimeMS=300000,
+    serverSelectionTimeoutMS=3000
+)
 db = client[os.environ['DB_NAME']]
 
 # Create downloads directory
 DOWNLOADS_DIR = ROOT_DIR / "downloads"
 DOWNLOADS_DIR.mkdir(exist_ok=True)
 
+# Output template used unless a request overrides the filename template
+DEFAULT_FILENAME_TEMPLATE = "%(title)s.%(ext)s"
+DEFAULT_OUTTMPL = str(DOWNLOADS_DIR / DEFAULT_FILENAME_TEMPLATE)
+
+# Worker pool for yt-dlp downloads; extra downloads wait in the pool's queue
+MAX_CONCURRENT_DOWNLOADS = 4
+DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_DOWNLOADS, thread_name_prefix="yt-dlp")
+
+# Separate pool for metadata probes so they never queue behind downloads
+METADATA_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="ydl-info")
+
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Mount static files for serving downloads
 app.mount("/downloads", StaticFiles(directory=str(DOWNLOADS_DIR)), name="downloads")
 
+class VideoFileResponse(FileResponse):
+    """FileResponse that reads downloaded videos in 1 MiB chunks instead of 64 KiB"""
+    chunk_size = 1 << 20
+
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
@@ -53,9 +77,23 @@ download_stats = {
     "total_size": 0,
     "average_speed": 0
 }
+# download_stats is updated from download threads; mutate and read it under this lock
+stats_lock = threading.Lock()
+
+# WebSocket clients for real-time updates, each with its own outbound queue
+clients: Dict[WebSocket, asyncio.Queue] = {}
+CLIENT_QUEUE_SIZE = 256
 
-# WebSocket connections for real-time updates
-websocket_connections = []
+# Messages at least this large are zlib-compressed before fan-out. Compressed
+# frames start with 0x78 and JSON frames with '{', so clients can tell them apart
+COMPRESS_MIN_SIZE = 4096
+
+# Idle clients get a heartbeat this often so proxies keep the socket open
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_MESSAGE = orjson.dumps({'type': 'heartbeat'})
+
+# Event loop the API runs on, captured at startup so worker threads can reach it
+MAIN_LOOP: Optional[asyncio.AbstractEventLoop] = None
 
 class VideoInfo(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -72,16 +110,40 @@ class VideoInfo(BaseModel):
     speed: str = ""
     eta: str = ""
     file_path: str = ""
+    basename: str = ""
     file_size: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    
+    # Plain-dict copy of the fields, kept in sync by set_fields. formats is left
+    # out: the frontend never reads it and it would dominate every delta
+    _cache: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    
+    def model_post_init(self, __context: Any) -> None:
+        self._cache = self.dict(exclude={'formats'})
+    
+    def set_fields(self, **changes):
+        """Update fields and their cached serialized values together"""
+        for name, value in changes.items():
+            setattr(self, name, value)
+        self._cache.update((k, v) for k, v in changes.items() if k != 'formats')
+    
+    def cached_dict(self) -> Dict[str, Any]:
+        """Serialized view of this download, without formats; shared, so callers must not mutate it"""
+        return self._cache
 
 class DownloadRequest(BaseModel):
     url: str
     quality: str = "best"
     format: str = "mp4"
-    filename_template: str = "%(title)s.%(ext)s"
+    filename_template: str = DEFAULT_FILENAME_TEMPLATE
     max_downloads: int = 3
 
+class BulkDownloadRequest(BaseModel):
+    urls: List[str]
+    quality: str = "best"
+    format: str = "mp4"
+    filename_template: str = DEFAULT_FILENAME_TEMPLATE
+
 class PlaylistRequest(BaseModel):
     url: str
     quality: str = "best"
@@ -92,98 +154,194 @@ class ScheduleRequest(BaseModel):
     video_id: str
     schedule_time: str  # HH:MM format
 
+# yt-dlp instances for metadata probes, one per metadata worker thread since
+# YoutubeDL is not safe to share between threads
+INFO_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'extract_flat': False,
+    'skip_download': True,
+}
+_info_ydl = threading.local()
+
+def get_info_ydl() -> yt_dlp.YoutubeDL:
+    """Return this thread's cached YoutubeDL for metadata extraction"""
+    ydl = getattr(_info_ydl, 'ydl', None)
+    if ydl is None:
+        ydl = _info_ydl.ydl = yt_dlp.YoutubeDL(INFO_YDL_OPTS)
+    return ydl
+
 def get_video_info(url: str) -> Dict[str, Any]:
     """Extract video information using yt-dlp"""
     try:
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
+        info = get_info_ydl().extract_info(url, download=False)
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            
-            if 'entries' in info:  # Playlist
-                return {
-                    'type': 'playlist',
-                    'title': info.get('title', 'Unknown Playlist'),
-                    'entries': [{
-                        'id': entry.get('id', ''),
-                        'title': entry.get('title', 'Unknown'),
-                        'url': entry.get('url', ''),
-                        'thumbnail': entry.get('thumbnail', ''),
-                        'duration': entry.get('duration', 0),
-                        'uploader': entry.get('uploader', ''),
-                        'view_count': entry.get('view_count', 0),
-                    } for entry in info['entries'][:50]]  # Limit to 50 videos
-                }
-            else:  # Single video
-                return {
-                    'type': 'video',
-                    'id': info.get('id', ''),
-                    'title': info.get('title', 'Unknown'),
-                    'thumbnail': info.get('thumbnail', ''),
-                    'duration': info.get('duration', 0),
-                    'uploader': info.get('uploader', ''),
-                    'view_count': info.get('view_count', 0),
-                    'upload_date': info.get('upload_date', ''),
-                    'formats': [
-                        {
-                            'format_id': f.get('format_id', ''),
-                            'ext': f.get('ext', ''),
-                            'quality': f.get('quality', ''),
-                            'filesize': f.get('filesize', 0),
-                            'height': f.get('height', 0),
-                            'width': f.get('width', 0),
-                        } for f in info.get('formats', [])
-                    ]
-                }
+        if 'entries' in info:  # Playlist
+            return {
+                'type': 'playlist',
+                'title': info.get('title', 'Unknown Playlist'),
+                'entries': [{
+                    'id': entry.get('id', ''),
+                    'title': entry.get('title', 'Unknown'),
+                    'url': entry.get('url', ''),
+                    'thumbnail': entry.get('thumbnail', ''),
+                    'duration': entry.get('duration', 0),
+                    'uploader': entry.get('uploader', ''),
+                    'view_count': entry.get('view_count', 0),
+                } for entry in info['entries'][:50]]  # Limit to 50 videos
+            }
+        else:  # Single video
+            return {
+                'type': 'video',
+                'id': info.get('id', ''),
+                'title': info.get('title', 'Unknown'),
+                'thumbnail': info.get('thumbnail', ''),
+                'duration': info.get('duration', 0),
+                'uploader': info.get('uploader', ''),
+                'view_count': info.get('view_count', 0),
+                'upload_date': info.get('upload_date', ''),
+                'formats': [
+                    {
+                        'format_id': f.get('format_id', ''),
+                        'ext': f.get('ext', ''),
+                        'quality': f.get('quality', ''),
+                        'filesize': f.get('filesize', 0),
+                        'height': f.get('height', 0),
+                        'width': f.get('width', 0),
+                    } for f in info.get('formats', [])
+                ]
+            }
     except Exception as e:
         logging.error(f"Error extracting info from {url}: {e}")
         raise HTTPException(status_code=400, detail=f"Could not extract video info: {str(e)}")
 
+async def fetch_video_info(url: str) -> Dict[str, Any]:
+    """Run get_video_info on the metadata pool without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(METADATA_POOL, get_video_info, url)
+
+# Minimum seconds between progress broadcasts for a single download
+PROGRESS_BROADCAST_INTERVAL = 0.25
+
+def bump_started():
+    """Count a newly launched download"""
+    with stats_lock:
+        download_stats['total_downloads'] += 1
+        download_stats['active_downloads'] += 1
+
+def bump_done(file_size: int):
+    """Count a finished download and its size"""
+    with stats_lock:
+        download_stats['done_downloads'] += 1
+        download_stats['active_downloads'] = max(0, download_stats['active_downloads'] - 1)
+        download_stats['total_size'] += file_size
+
+def snapshot_stats() -> Dict[str, Any]:
+    """Consistent copy of download_stats"""
+    with stats_lock:
+        return dict(download_stats)
+
 class DownloadProgressHook:
     def __init__(self, video_id: str):
         self.video_id = video_id
+        self._last_emit = 0.0
         
     def __call__(self, d):
-        if self.video_id in active_downloads:
-            video_info = active_downloads[self.video_id]
-            
-            if d['status'] == 'downloading':
-                downloaded = d.get('downloaded_bytes', 0)
-                total = d.get('total_bytes', d.get('total_bytes_estimate', 0))
-                
-                if total > 0:
-                    progress = (downloaded / total) * 100
-                    video_info.progress = round(progress, 1)
-                
-                video_info.speed = d.get('speed_str', '')
-                video_info.eta = d.get('eta_str', '')
-                video_info.status = 'downloading'
-                
-                # Update file size
-                if total > 0:
-                    video_info.file_size = total
-                    
-            elif d['status'] == 'finished':
-                video_info.progress = 100.0
-                video_info.status = 'completed'
-                video_info.file_path = d['filename']
-                
-                # Update global stats
-                download_stats['done_downloads'] += 1
-                download_stats['active_downloads'] = max(0, download_stats['active_downloads'] - 1)
-                download_stats['total_size'] += video_info.file_size
+        # 'finished' fires once per stream (video and audio are fetched separately
+        # before merging), so completion is recorded by DownloadCompletePP instead
+        if d['status'] != 'downloading' or self.video_id not in active_downloads:
+            return
+        video_info = active_downloads[self.video_id]
+        
+        downloaded = d.get('downloaded_bytes', 0)
+        total = d.get('total_bytes', d.get('total_bytes_estimate', 0))
+        
+        changes = {
+            'speed': d.get('speed_str', ''),
+            'eta': d.get('eta_str', ''),
+            'status': 'downloading',
+        }
+        
+        if total > 0:
+            changes['progress'] = round((downloaded / total) * 100, 1)
+            # Update file size
+            changes['file_size'] = total
+        
+        video_info.set_fields(**changes)
+        
+        # yt-dlp reports progress far more often than clients can show it, so
+        # coalesce updates
+        now = time.monotonic()
+        if now - self._last_emit < PROGRESS_BROADCAST_INTERVAL:
+            return
+        self._last_emit = now
+        
+        # Broadcast update to all connected WebSockets
+        broadcast_delta([self.video_id])
+
+class DownloadCompletePP(PostProcessor):
+    """Marks a download completed once yt-dlp has merged, converted and moved the file"""
+    def __init__(self, video_id: str):
+        super().__init__()
+        self.video_id = video_id
+    
+    def run(self, info):
+        video_info = active_downloads.get(self.video_id)
+        if video_info is not None:
+            file_path = info['filepath']
+            video_info.set_fields(
+                progress=100.0,
+                status='completed',
+                file_path=file_path,
+                basename=os.path.basename(file_path),
+                # Stream totals don't add up to the merged or converted file
+                file_size=os.path.getsize(file_path)
+            )
             
-            # Broadcast update to all connected WebSockets
-            broadcast_update({
-                'type': 'download_progress',
-                'video_id': self.video_id,
-                'data': video_info.dict(),
-                'stats': download_stats
-            })
+            # Update global stats
+            bump_done(video_info.file_size)
+            broadcast_delta([self.video_id])
+        return [], info
+
+# Heights offered as quality choices; anything else falls back to 'best'
+QUALITY_HEIGHTS = ('2160', '1440', '1080', '720', '480', '360')
+
+# Containers that get an ext preference, mapped to the audio ext that merges into them
+PREFERRED_EXTS = {'mp4': 'm4a', 'webm': 'webm'}
+
+def build_format_selectors() -> Dict[tuple, str]:
+    """Precompute yt-dlp format selectors keyed by (preferred ext, quality)"""
+    selectors = {}
+    for ext in (*PREFERRED_EXTS, None):
+        for quality in ('best',) + QUALITY_HEIGHTS:
+            height = f"[height<={quality}]" if quality != 'best' else ""
+            # Separate video and audio streams (merged by ffmpeg), then a single file
+            selector = f"bestvideo{height}+bestaudio/best{height}/best" if height else "bestvideo+bestaudio/best"
+            if ext:
+                selector = f"bestvideo[ext={ext}]{height}+bestaudio[ext={PREFERRED_EXTS[ext]}]/" + selector
+            selectors[(ext, quality)] = selector
+    return selectors
+
+FORMAT_SELECTORS = build_format_selectors()
+
+MP3_OPTS = {
+    'format': 'bestaudio/best',
+    'postprocessors': [{
+        'key': 'FFmpegExtractAudio',
+        'preferredcodec': 'mp3',
+        'preferredquality': '192',
+    }],
+}
+
+def get_format_selector(fmt: Optional[str], quality: str) -> str:
+    """Look up the precomputed selector for a container/quality pair"""
+    ext = fmt if fmt in PREFERRED_EXTS else None
+    return FORMAT_SELECTORS.get((ext, quality), FORMAT_SELECTORS[(ext, 'best')])
+
+def get_outtmpl(filename_template: str) -> str:
+    """Full yt-dlp output template, reusing the precomputed default"""
+    if filename_template == DEFAULT_FILENAME_TEMPLATE:
+        return DEFAULT_OUTTMPL
+    return str(DOWNLOADS_DIR / filename_template)
 
 def download_video_thread(video_id: str, url: str, options: Dict):
     """Download video in a separate thread"""
@@ -191,8 +349,8 @@ def download_video_thread(video_id: str, url: str, options: Dict):
         progress_hook = DownloadProgressHook(video_id)
         
         ydl_opts = {
-            'outtmpl': str(DOWNLOADS_DIR / options.get('filename_template', '%(title)s.%(ext)s')),
-            'format': f"best[height<={options.get('quality', 'best')}]/best",
+            'outtmpl': get_outtmpl(options.get('filename_template', DEFAULT_FILENAME_TEMPLATE)),
+            'format': get_format_selector(options.get('format'), options.get('quality', 'best')),
             'progress_hooks': [progress_hook],
             'quiet': True,
             'no_warnings': True,
@@ -200,35 +358,105 @@ def download_video_thread(video_id: str, url: str, options: Dict):
         
         # Handle format preference
         if options.get('format') == 'mp3':
-            ydl_opts['format'] = 'bestaudio/best'
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
-        elif options.get('format') == 'mp4':
-            ydl_opts['format'] = 'best[ext=mp4]/best'
+            ydl_opts.update(MP3_OPTS)
+        elif options.get('format') in PREFERRED_EXTS:
+            ydl_opts['merge_output_format'] = options['format']
             
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.add_post_processor(DownloadCompletePP(video_id), when='after_move')
             ydl.download([url])
             
     except Exception as e:
         logging.error(f"Download failed for {video_id}: {e}")
         if video_id in active_downloads:
-            active_downloads[video_id].status = 'failed'
+            active_downloads[video_id].set_fields(status='failed')
+            broadcast_delta([video_id])
             broadcast_update({
                 'type': 'download_error',
                 'video_id': video_id,
                 'error': str(e)
             })
 
+def encode_message(message: Dict) -> bytes:
+    """Serialize (and, when large, deflate) a WebSocket message once so every client shares it"""
+    payload = orjson.dumps(message, default=str)
+    if len(payload) >= COMPRESS_MIN_SIZE:
+        payload = zlib.compress(payload, 1)
+    return payload
+
+def encode_snapshot() -> bytes:
+    """Serialize every active download, for clients that need to (re)sync from scratch"""
+    return encode_message({
+        'type': 'snapshot',
+        'stats': snapshot_stats(),
+        'active_downloads': {k: v.cached_dict() for k, v in active_downloads.items()}
+    })
+
+def enqueue_message(queue: asyncio.Queue, payload: bytes):
+    """Queue a message for one client (runs on the event loop)"""
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        # Deltas can't be dropped safely, so a client that fell behind discards
+        # its backlog and resyncs from a fresh snapshot instead
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(encode_snapshot())
+
+def fan_out(payload: bytes):
+    """Queue a serialized message for every connected client (runs on the event loop)"""
+    for queue in clients.values():
+        enqueue_message(queue, payload)
+
 def broadcast_update(message: Dict):
-    """Broadcast update to all connected WebSocket clients"""
-    for connection in websocket_connections[:]:
+    """Broadcast update to all connected WebSocket clients (safe to call from any thread)"""
+    if MAIN_LOOP is None or not clients:
+        return
+    MAIN_LOOP.call_soon_threadsafe(fan_out, encode_message(message))
+
+def broadcast_delta(video_ids: List[str]):
+    """Push the current state of the given downloads, plus stats, to every client (safe to call from any thread)"""
+    if MAIN_LOOP is None or not clients:
+        return
+    MAIN_LOOP.call_soon_threadsafe(fan_out_delta, video_ids)
+
+def fan_out_delta(video_ids: List[str]):
+    """Read and queue the given downloads' state on the event loop, so a delta
+    scheduled by a worker thread can't resurrect a download deleted meanwhile"""
+    changed = {}
+    removed = []
+    for video_id in video_ids:
+        video_info = active_downloads.get(video_id)
+        if video_info is None:
+            removed.append(video_id)
+        else:
+            changed[video_id] = video_info.cached_dict()
+    
+    fan_out(encode_message({
+        'type': 'delta',
+        'stats': snapshot_stats(),
+        'active_downloads': changed,
+        'removed': removed
+    }))
+
+async def websocket_sender(websocket: WebSocket, queue: asyncio.Queue):
+    """Drain a client's queue onto its socket, with a heartbeat when idle"""
+    while True:
         try:
-            asyncio.create_task(connection.send_text(json.dumps(message)))
-        except:
-            websocket_connections.remove(connection)
+            # Unlike wait_for, this doesn't wrap every get() in a new Task
+            async with asyncio.timeout(HEARTBEAT_INTERVAL):
+                payload = await queue.get()
+        except TimeoutError:
+            # Keeps proxies from closing the idle socket
+            payload = HEARTBEAT_MESSAGE
+        await websocket.send_bytes(payload)
+
+async def websocket_receiver(websocket: WebSocket):
+    """Wait for the client to disconnect; incoming messages are ignored"""
+    while True:
+        message = await websocket.receive()
+        if message['type'] == 'websocket.disconnect':
+            return
 
 # API Endpoints
 @api_router.get("/")
@@ -238,7 +466,7 @@ async def root():
 @api_router.get("/stats")
 async def get_stats():
     """Get download statistics"""
-    return download_stats
+    return snapshot_stats()
 
 @api_router.post("/analyze")
 async def analyze_url(request: dict):
@@ -248,87 +476,126 @@ async def analyze_url(request: dict):
         raise HTTPException(status_code=400, detail="URL is required")
     
     try:
-        info = get_video_info(url)
+        info = await fetch_video_info(url)
         return info
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+async def prepare_download(request: DownloadRequest) -> VideoInfo:
+    """Probe a single video URL and build its VideoInfo"""
+    # Get video info first
+    info = await fetch_video_info(request.url)
+    
+    if info['type'] != 'video':
+        raise HTTPException(status_code=400, detail="URL must be a single video")
+    
+    # Create video info object
+    return VideoInfo(
+        id=str(uuid.uuid4()),
+        url=request.url,
+        title=info['title'],
+        thumbnail=info['thumbnail'],
+        duration=info['duration'],
+        uploader=info['uploader'],
+        view_count=info['view_count'],
+        upload_date=info['upload_date'],
+        formats=info['formats'],
+        status="pending"
+    )
+
+def launch_download(video_info: VideoInfo, request: DownloadRequest):
+    """Track a prepared download and hand it to the worker pool"""
+    video_id = video_info.id
+    
+    # Add to active downloads
+    active_downloads[video_id] = video_info
+    
+    # Update stats
+    bump_started()
+    broadcast_delta([video_id])
+    
+    # Start download on the worker pool
+    options = {
+        'quality': request.quality,
+        'format': request.format,
+        'filename_template': request.filename_template
+    }
+    
+    asyncio.get_running_loop().run_in_executor(
+        DOWNLOAD_POOL, download_video_thread, video_id, request.url, options
+    )
+    
+    return {"video_id": video_id, "status": "started", "info": video_info.dict()}
+
 @api_router.post("/download")
 async def start_download(request: DownloadRequest):
     """Start a single video download"""
     try:
-        # Get video info first
-        info = get_video_info(request.url)
-        
-        if info['type'] != 'video':
-            raise HTTPException(status_code=400, detail="URL must be a single video")
-        
-        # Create video info object
-        video_id = str(uuid.uuid4())
-        video_info = VideoInfo(
-            id=video_id,
-            url=request.url,
-            title=info['title'],
-            thumbnail=info['thumbnail'],
-            duration=info['duration'],
-            uploader=info['uploader'],
-            view_count=info['view_count'],
-            upload_date=info['upload_date'],
-            formats=info['formats'],
-            status="pending"
-        )
-        
-        # Add to active downloads
-        active_downloads[video_id] = video_info
-        
-        # Update stats
-        download_stats['total_downloads'] += 1
-        download_stats['active_downloads'] += 1
+        video_info = await prepare_download(request)
         
         # Store in database
         await db.downloads.insert_one(video_info.dict())
         
-        # Start download in thread
-        options = {
-            'quality': request.quality,
-            'format': request.format,
-            'filename_template': request.filename_template
-        }
+        return launch_download(video_info, request)
         
-        thread = threading.Thread(
-            target=download_video_thread,
-            args=(video_id, request.url, options)
-        )
-        thread.start()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def start_downloads(download_reqs: List[DownloadRequest]) -> List[Dict[str, Any]]:
+    """Probe several URLs in parallel, store them with one write and start them"""
+    prepared = await asyncio.gather(
+        *[prepare_download(download_req) for download_req in download_reqs],
+        return_exceptions=True
+    )
+    
+    # Store every probed video with a single write
+    docs = [p.dict() for p in prepared if isinstance(p, VideoInfo)]
+    if docs:
+        await db.downloads.insert_many(docs, ordered=False)
+    
+    results = []
+    for download_req, video_info in zip(download_reqs, prepared):
+        if isinstance(video_info, VideoInfo):
+            results.append(launch_download(video_info, download_req))
+        else:
+            results.append({"url": download_req.url, "error": str(video_info)})
+    return results
+
+@api_router.post("/download/bulk")
+async def bulk_download(request: BulkDownloadRequest):
+    """Start downloads for a list of video URLs"""
+    try:
+        results = await start_downloads([
+            DownloadRequest(
+                url=url,
+                quality=request.quality,
+                format=request.format,
+                filename_template=request.filename_template
+            )
+            for url in request.urls
+        ])
         
-        return {"video_id": video_id, "status": "started", "info": video_info.dict()}
+        return {
+            "total": len(request.urls),
+            "results": results
+        }
         
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-
-
 @api_router.post("/download/playlist")
 async def download_playlist(request: PlaylistRequest):
     """Download playlist/channel videos"""
     try:
-        info = get_video_info(request.url)
+        info = await fetch_video_info(request.url)
         
         if info['type'] != 'playlist':
             raise HTTPException(status_code=400, detail="URL must be a playlist or channel")
         
-        results = []
-        for entry in info['entries'][:request.max_videos]:
-            try:
-                download_req = DownloadRequest(
-                    url=entry['url'],
-                    quality=request.quality,
-                    format=request.format
-                )
-                result = await start_download(download_req)
-                results.append(result)
-            except Exception as e:
-                results.append({"url": entry['url'], "error": str(e)})
+        results = await start_downloads([
+            DownloadRequest(url=entry['url'], quality=request.quality, format=request.format)
+            for entry in info['entries'][:request.max_videos]
+        ])
         
         return {
             "playlist_title": info['title'],
@@ -344,32 +611,20 @@ async def download_playlist(request: PlaylistRequest):
 async def get_downloads():
     """Get all downloads from database"""
     try:
-        downloads = await db.downloads.find({}, {"_id": 0}).sort("created_at", -1).to_list(100)
-        # Process downloads for JSON serialization
-        processed_downloads = []
-        
-        for download in downloads:
-            # Convert datetime to string for JSON serialization
-            if 'created_at' in download and download['created_at']:
-                if hasattr(download['created_at'], 'isoformat'):
-                    download['created_at'] = download['created_at'].isoformat()
-            
-            # Merge with active downloads for real-time status
-            if download['id'] in active_downloads:
-                active_data = active_downloads[download['id']].dict()
-                # Convert datetime to string for JSON serialization
-                if 'created_at' in active_data and active_data['created_at']:
-                    if hasattr(active_data['created_at'], 'isoformat'):
-                        active_data['created_at'] = active_data['created_at'].isoformat()
-                download.update(active_data)
-            
-            processed_downloads.append(download)
-            
-        return processed_downloads
+        # Persisted records only; clients overlay live status from /downloads/active
+        # or the WebSocket. Served from the created_at index.
+        downloads = await db.downloads.find({}, {"_id": 0, "formats": 0}).sort([("created_at", -1)]).limit(100).to_list(None)
+        # Rows are plain BSON types, so hand them straight to orjson
+        return ORJSONResponse(downloads)
     except Exception as e:
         logging.error(f"Error getting downloads: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/downloads/active")
+async def get_active_downloads():
+    """Get live status of downloads tracked in memory"""
+    return {k: v.cached_dict() for k, v in active_downloads.items()}
+
 @api_router.delete("/downloads/{video_id}")
 async def delete_download(video_id: str):
     """Delete a download record and file"""
@@ -377,17 +632,17 @@ async def delete_download(video_id: str):
         # Remove from database
         await db.downloads.delete_one({"id": video_id})
         
-        # Remove from active downloads
-        if video_id in active_downloads:
-            video_info = active_downloads[video_id]
+        # Remove from active downloads before awaiting the file work, so a
+        # concurrent delete finds it already gone
+        video_info = active_downloads.pop(video_id, None)
+        if video_info is not None:
+            broadcast_delta([video_id])
             # Try to delete file
             try:
-                if video_info.file_path and os.path.exists(video_info.file_path):
-                    os.remove(video_info.file_path)
+                if video_info.file_path and await asyncio.to_thread(os.path.exists, video_info.file_path):
+                    await asyncio.to_thread(os.remove, video_info.file_path)
             except Exception as e:
                 logging.error(f"Could not delete file: {e}")
-            
-            del active_downloads[video_id]
         
         return {"message": "Download deleted successfully"}
     except Exception as e:
@@ -399,36 +654,45 @@ async def clear_history():
     try:
         await db.downloads.delete_many({})
         
-        # Clear active downloads
-        for video_id in list(active_downloads.keys()):
-            video_info = active_downloads[video_id]
+        # Clear finished downloads and total up what remains in a single pass
+        removed = []
+        remaining = downloading = 0
+        for video_id, video_info in list(active_downloads.items()):
             if video_info.status in ['completed', 'failed']:
                 del active_downloads[video_id]
+                removed.append(video_id)
+                continue
+            remaining += 1
+            if video_info.status == 'downloading':
+                downloading += 1
         
         # Reset stats
-        download_stats.update({
-            "total_downloads": len(active_downloads),
-            "active_downloads": len([v for v in active_downloads.values() if v.status == 'downloading']),
-            "done_downloads": 0,
-            "total_size": sum(v.file_size for v in active_downloads.values() if v.status == 'completed'),
-            "average_speed": 0
-        })
+        with stats_lock:
+            download_stats.update({
+                "total_downloads": remaining,
+                "active_downloads": downloading,
+                "done_downloads": 0,
+                # Completed downloads were all just removed
+                "total_size": 0,
+                "average_speed": 0
+            })
+        broadcast_delta(removed)
         
         return {"message": "History cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@api_router.get("/download/{video_id}/file")
+@api_router.api_route("/download/{video_id}/file", methods=["GET", "HEAD"])
 async def download_file(video_id: str):
     """Download the actual video file"""
     if video_id in active_downloads:
         video_info = active_downloads[video_id]
         if video_info.status == 'completed' and video_info.file_path:
-            if os.path.exists(video_info.file_path):
-                return FileResponse(
+            if await asyncio.to_thread(os.path.exists, video_info.file_path):
+                return VideoFileResponse(
                     video_info.file_path,
-                    media_type='application/octet-stream',
-                    filename=os.path.basename(video_info.file_path)
+                    media_type=mimetypes.guess_type(video_info.file_path)[0] or 'application/octet-stream',
+                    filename=video_info.basename
                 )
     
     raise HTTPException(status_code=404, detail="File not found")
@@ -437,39 +701,27 @@ async def download_file(video_id: str):
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates"""
     await websocket.accept()
-    websocket_connections.append(websocket)
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    clients[websocket] = queue
+    sender = asyncio.create_task(websocket_sender(websocket, queue))
+    receiver = asyncio.create_task(websocket_receiver(websocket))
+    
+    # Start the client off with every active download; after that only changes are pushed
+    enqueue_message(queue, encode_snapshot())
     
     try:
-        while True:
-            # Send periodic updates
-            active_downloads_dict = {}
-            for k, v in active_downloads.items():
-                video_dict = v.dict()
-                # Convert datetime to string for JSON serialization
-                if 'created_at' in video_dict and video_dict['created_at']:
-                    if hasattr(video_dict['created_at'], 'isoformat'):
-                        video_dict['created_at'] = video_dict['created_at'].isoformat()
-                active_downloads_dict[k] = video_dict
-                
-            try:
-                await websocket.send_text(json.dumps({
-                    'type': 'stats_update',
-                    'stats': download_stats,
-                    'active_downloads': active_downloads_dict
-                }))
-            except Exception as send_error:
-                logging.error(f"WebSocket send error: {send_error}")
-                break
-                
-            await asyncio.sleep(1)
-            
+        # Runs until the client disconnects or a send fails
+        done, _ = await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         pass
     except Exception as e:
         logging.error(f"WebSocket error: {e}")
     finally:
-        if websocket in websocket_connections:
-            websocket_connections.remove(websocket)
+        clients.pop(websocket, None)
+        sender.cancel()
+        receiver.cancel()
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -489,6 +741,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def startup_event():
+    global MAIN_LOOP
+    MAIN_LOOP = asyncio.get_running_loop()
+
+@app.on_event("startup")
+async def create_indexes():
+    # get_downloads sorts by created_at and deletes look up by id
+    try:
+        await db.downloads.create_index([("created_at", -1)])
+        await db.downloads.create_index("id", unique=True)
+    except Exception as e:
+        logging.error(f"Could not create indexes: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    client.close()
+    DOWNLOAD_POOL.shutdown(wait=False, cancel_futures=True)
+    METADATA_POOL.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file
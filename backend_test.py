@@ -4,9 +4,9 @@ Comprehensive Backend API Testing for StreamVault Video Downloader
 Tests all API endpoints with real YouTube URLs
 """
 
-import requests
-import json
-import time
+import httpx
+import orjson
+import zlib
 import asyncio
 import websockets
 import os
@@ -27,11 +27,64 @@ TEST_BULK_URLS = [
     "https://www.youtube.com/watch?v=L_jWHffIx5E"  # Smash Mouth - All Star
 ]
 
+# Endpoint paths, relative to the client's API_BASE base_url
+URL_ROOT = "/"
+URL_ANALYZE = "/analyze"
+URL_DOWNLOAD = "/download"
+URL_BULK_DOWNLOAD = "/download/bulk"
+URL_PLAYLIST_DOWNLOAD = "/download/playlist"
+URL_DOWNLOADS = "/downloads"
+URL_ACTIVE_DOWNLOADS = "/downloads/active"
+URL_STATS = "/stats"
+
+# Request bodies, serialized once and sent as-is
+JSON_HEADERS = {"Content-Type": "application/json"}
+ANALYZE_VIDEO_BODY = orjson.dumps({"url": TEST_VIDEO_URL})
+ANALYZE_PLAYLIST_BODY = orjson.dumps({"url": TEST_PLAYLIST_URL})
+ANALYZE_INVALID_BODY = orjson.dumps({"url": "https://invalid-url.com"})
+SINGLE_DL_BODY = orjson.dumps({
+    "url": TEST_VIDEO_URL,
+    "quality": "best",
+    "format": "mp4",
+    "filename_template": "%(title)s.%(ext)s"
+})
+BULK_DL_BODY = orjson.dumps({
+    "urls": TEST_BULK_URLS,
+    "quality": "best",
+    "format": "mp4"
+})
+PLAYLIST_DL_BODY = orjson.dumps({
+    "url": TEST_PLAYLIST_URL,
+    "quality": "best",
+    "format": "mp4",
+    "max_videos": 5
+})
+FILE_DL_BODY = orjson.dumps({
+    "url": TEST_VIDEO_URL,
+    "quality": "best",
+    "format": "mp4"
+})
+
 class BackendTester:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.timeout = 30
+        # One pooled HTTP/2 client shared by every test so they can run concurrently
+        self.client = httpx.AsyncClient(
+            base_url=API_BASE,
+            timeout=30.0,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                retries=2
+            )
+        )
         self.test_results = {}
+        # ID of the download test_single_download starts, deleted again by test_delete_download
+        self.single_video_id = None
+        # Messages from the shared WebSocket, filled in by _ws_listener
+        self.ws_messages = []
+        self.ws_error = None
+        self.ws_done = False
+        self.ws_condition = None
         
     def log_test(self, test_name, success, details=""):
         """Log test results"""
@@ -41,12 +94,34 @@ class BackendTester:
             print(f"   Details: {details}")
         self.test_results[test_name] = {"success": success, "details": details}
         
-    def test_api_health(self):
+    def _json(self, response):
+        """Parse a response body with orjson"""
+        return orjson.loads(response.content)
+    
+    async def _wait_for(self, predicate, timeout=10, initial=0.05):
+        """Await predicate() with exponential backoff until it is truthy or timeout elapses"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        attempt = 0
+        while True:
+            result = await predicate()
+            remaining = deadline - loop.time()
+            if result or remaining <= 0:
+                return result
+            await asyncio.sleep(min(initial * 2 ** attempt, 1.0, remaining))
+            attempt += 1
+    
+    async def test_api_health(self):
         """Test basic API health endpoint"""
         try:
-            response = self.session.get(f"{API_BASE}/")
+            response = await self.client.get(URL_ROOT)
+            
+            # HTTP/2 is only negotiated over TLS, so only check it for https backends
+            if API_BASE.startswith("https://"):
+                self.log_test("HTTP/2 Negotiation", response.http_version == "HTTP/2", f"Version: {response.http_version}")
+            
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if "message" in data and "StreamVault" in data["message"]:
                     self.log_test("API Health Check", True, f"Response: {data}")
                     return True
@@ -60,15 +135,20 @@ class BackendTester:
             self.log_test("API Health Check", False, f"Exception: {str(e)}")
             return False
     
-    def test_url_analysis(self):
+    async def test_url_analysis(self):
         """Test URL analysis endpoint"""
         try:
-            # Test single video analysis
-            payload = {"url": TEST_VIDEO_URL}
-            response = self.session.post(f"{API_BASE}/analyze", json=payload)
+            # The three analyses are independent, so issue them together
+            video_response, playlist_response, invalid_response = await asyncio.gather(
+                self.client.post(URL_ANALYZE, content=ANALYZE_VIDEO_BODY, headers=JSON_HEADERS),
+                self.client.post(URL_ANALYZE, content=ANALYZE_PLAYLIST_BODY, headers=JSON_HEADERS),
+                self.client.post(URL_ANALYZE, content=ANALYZE_INVALID_BODY, headers=JSON_HEADERS),
+            )
             
+            # Test single video analysis
+            response = video_response
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if data.get("type") == "video" and "title" in data:
                     self.log_test("URL Analysis - Single Video", True, f"Title: {data.get('title', 'N/A')}")
                     video_analysis_success = True
@@ -80,11 +160,10 @@ class BackendTester:
                 video_analysis_success = False
             
             # Test playlist analysis
-            payload = {"url": TEST_PLAYLIST_URL}
-            response = self.session.post(f"{API_BASE}/analyze", json=payload)
+            response = playlist_response
             
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if data.get("type") == "playlist" and "entries" in data:
                     self.log_test("URL Analysis - Playlist", True, f"Entries: {len(data.get('entries', []))}")
                     playlist_analysis_success = True
@@ -96,8 +175,7 @@ class BackendTester:
                 playlist_analysis_success = False
             
             # Test invalid URL
-            payload = {"url": "https://invalid-url.com"}
-            response = self.session.post(f"{API_BASE}/analyze", json=payload)
+            response = invalid_response
             
             if response.status_code == 400:
                 self.log_test("URL Analysis - Invalid URL", True, "Correctly rejected invalid URL")
@@ -112,34 +190,42 @@ class BackendTester:
             self.log_test("URL Analysis", False, f"Exception: {str(e)}")
             return False
     
-    def test_single_download(self):
+    async def test_single_download(self):
         """Test single video download endpoint"""
         try:
-            payload = {
-                "url": TEST_VIDEO_URL,
-                "quality": "best",
-                "format": "mp4",
-                "filename_template": "%(title)s.%(ext)s"
-            }
-            
-            response = self.session.post(f"{API_BASE}/download", json=payload)
+            response = await self.client.post(URL_DOWNLOAD, content=SINGLE_DL_BODY, headers=JSON_HEADERS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if "video_id" in data and "status" in data and data["status"] == "started":
                     video_id = data["video_id"]
+                    self.single_video_id = video_id
                     self.log_test("Single Video Download", True, f"Started download with ID: {video_id}")
                     
-                    # Wait a bit and check status
-                    time.sleep(2)
-                    downloads_response = self.session.get(f"{API_BASE}/downloads")
-                    if downloads_response.status_code == 200:
-                        downloads = downloads_response.json()
-                        download_found = any(d.get("id") == video_id for d in downloads)
-                        if download_found:
-                            self.log_test("Download Persistence", True, "Download found in database")
-                        else:
-                            self.log_test("Download Persistence", False, "Download not found in database")
+                    # Poll until the download shows up instead of sleeping a fixed time
+                    async def download_listed():
+                        downloads_response = await self.client.get(URL_DOWNLOADS)
+                        return downloads_response.status_code == 200 and any(
+                            d.get("id") == video_id for d in self._json(downloads_response)
+                        )
+                    
+                    if await self._wait_for(download_listed):
+                        self.log_test("Download Persistence", True, "Download found in database")
+                    else:
+                        self.log_test("Download Persistence", False, "Download not found in database")
+                    
+                    # Live status is served separately from the persisted list
+                    active_response = await self.client.get(URL_ACTIVE_DOWNLOADS)
+                    if active_response.status_code == 200 and video_id in self._json(active_response):
+                        self.log_test("Active Download Tracking", True, "Download listed as active")
+                    else:
+                        self.log_test("Active Download Tracking", False, f"Status: {active_response.status_code}, download not listed as active")
+                    
+                    # The shared WebSocket should announce the new download
+                    if await self._wait_for_ws(lambda m: video_id in (m.get("active_downloads") or {})):
+                        self.log_test("Download Progress Events", True, "Download announced over WebSocket")
+                    else:
+                        self.log_test("Download Progress Events", False, "No WebSocket update for download")
                     
                     return True
                 else:
@@ -153,19 +239,13 @@ class BackendTester:
             self.log_test("Single Video Download", False, f"Exception: {str(e)}")
             return False
     
-    def test_bulk_download(self):
+    async def test_bulk_download(self):
         """Test bulk download endpoint"""
         try:
-            payload = {
-                "urls": TEST_BULK_URLS,
-                "quality": "best",
-                "format": "mp4"
-            }
-            
-            response = self.session.post(f"{API_BASE}/download/bulk", json=payload)
+            response = await self.client.post(URL_BULK_DOWNLOAD, content=BULK_DL_BODY, headers=JSON_HEADERS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if "results" in data and len(data["results"]) == len(TEST_BULK_URLS):
                     successful_downloads = sum(1 for result in data["results"] if "video_id" in result)
                     self.log_test("Bulk Download", True, f"Started {successful_downloads}/{len(TEST_BULK_URLS)} downloads")
@@ -181,20 +261,13 @@ class BackendTester:
             self.log_test("Bulk Download", False, f"Exception: {str(e)}")
             return False
     
-    def test_playlist_download(self):
+    async def test_playlist_download(self):
         """Test playlist download endpoint"""
         try:
-            payload = {
-                "url": TEST_PLAYLIST_URL,
-                "quality": "best",
-                "format": "mp4",
-                "max_videos": 5
-            }
-            
-            response = self.session.post(f"{API_BASE}/download/playlist", json=payload)
+            response = await self.client.post(URL_PLAYLIST_DOWNLOAD, content=PLAYLIST_DL_BODY, headers=JSON_HEADERS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 if "playlist_title" in data and "results" in data:
                     self.log_test("Playlist Download", True, f"Playlist: {data.get('playlist_title', 'N/A')}, Videos: {len(data.get('results', []))}")
                     return True
@@ -209,13 +282,13 @@ class BackendTester:
             self.log_test("Playlist Download", False, f"Exception: {str(e)}")
             return False
     
-    def test_statistics(self):
+    async def test_statistics(self):
         """Test statistics endpoint"""
         try:
-            response = self.session.get(f"{API_BASE}/stats")
+            response = await self.client.get(URL_STATS)
             
             if response.status_code == 200:
-                data = response.json()
+                data = self._json(response)
                 required_fields = ["total_downloads", "active_downloads", "done_downloads", "total_size", "average_speed"]
                 if all(field in data for field in required_fields):
                     self.log_test("Statistics", True, f"Stats: {data}")
@@ -231,77 +304,129 @@ class BackendTester:
             self.log_test("Statistics", False, f"Exception: {str(e)}")
             return False
     
-    def test_download_management(self):
-        """Test download management endpoints"""
+    async def test_get_downloads(self):
+        """Test listing downloads"""
         try:
-            # Test get downloads
-            response = self.session.get(f"{API_BASE}/downloads")
+            response = await self.client.get(URL_DOWNLOADS)
             
             if response.status_code == 200:
-                downloads = response.json()
+                downloads = self._json(response)
                 self.log_test("Get Downloads", True, f"Found {len(downloads)} downloads")
+                return True
+            else:
+                self.log_test("Get Downloads", False, f"Status: {response.status_code}")
+                return False
                 
-                # Test delete specific download if any exist
-                if downloads:
-                    video_id = downloads[0].get("id")
-                    if video_id:
-                        delete_response = self.session.delete(f"{API_BASE}/downloads/{video_id}")
-                        if delete_response.status_code == 200:
-                            self.log_test("Delete Specific Download", True, f"Deleted download {video_id}")
-                        else:
-                            self.log_test("Delete Specific Download", False, f"Status: {delete_response.status_code}")
-                    else:
-                        self.log_test("Delete Specific Download", False, "No video ID found")
-                else:
-                    self.log_test("Delete Specific Download", True, "No downloads to delete")
-                
-                # Test clear history
-                clear_response = self.session.delete(f"{API_BASE}/downloads")
-                if clear_response.status_code == 200:
-                    self.log_test("Clear Download History", True, "History cleared successfully")
+        except Exception as e:
+            self.log_test("Get Downloads", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_get_active_downloads(self):
+        """Test listing live download status"""
+        try:
+            response = await self.client.get(URL_ACTIVE_DOWNLOADS)
+            
+            if response.status_code == 200:
+                active = self._json(response)
+                if isinstance(active, dict):
+                    self.log_test("Get Active Downloads", True, f"Found {len(active)} active downloads")
                     return True
                 else:
-                    self.log_test("Clear Download History", False, f"Status: {clear_response.status_code}")
+                    self.log_test("Get Active Downloads", False, f"Unexpected response: {active}")
                     return False
             else:
-                self.log_test("Get Downloads", False, f"Status: {response.status_code}")
+                self.log_test("Get Active Downloads", False, f"Status: {response.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Get Active Downloads", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_download_management(self):
+        """Test download management endpoints"""
+        try:
+            # Test clear history with a single server-side delete
+            clear_response = await self.client.delete(URL_DOWNLOADS)
+            if clear_response.status_code != 200:
+                self.log_test("Clear Download History", False, f"Status: {clear_response.status_code}")
                 return False
+            
+            remaining_response = await self.client.get(URL_DOWNLOADS)
+            if remaining_response.status_code != 200:
+                self.log_test("Clear Download History", False, f"Listing after clear failed: {remaining_response.status_code}")
+                return False
+            
+            remaining = self._json(remaining_response)
+            if not isinstance(remaining, list):
+                self.log_test("Clear Download History", False, f"Unexpected response: {remaining}")
+                return False
+            if remaining:
+                self.log_test("Clear Download History", False, f"{len(remaining)} downloads left after clear")
+                return False
+            
+            self.log_test("Clear Download History", True, "History cleared successfully")
+            return True
                 
         except Exception as e:
             self.log_test("Download Management", False, f"Exception: {str(e)}")
             return False
     
-    def test_file_serving(self):
+    async def test_delete_download(self):
+        """Test deleting a single download by ID"""
+        try:
+            # Reuses the download test_single_download started
+            if not self.single_video_id:
+                self.log_test("Delete Specific Download", True, "No downloads to delete")
+                return True
+            
+            response = await self.client.delete(f"{URL_DOWNLOADS}/{self.single_video_id}")
+            if response.status_code == 200:
+                self.log_test("Delete Specific Download", True, f"Deleted download {self.single_video_id}")
+                return True
+            else:
+                self.log_test("Delete Specific Download", False, f"Status: {response.status_code}")
+                return False
+                
+        except Exception as e:
+            self.log_test("Delete Specific Download", False, f"Exception: {str(e)}")
+            return False
+    
+    async def test_file_serving(self):
         """Test file serving endpoint"""
         try:
             # First start a download to have a file to serve
-            payload = {
-                "url": TEST_VIDEO_URL,
-                "quality": "best",
-                "format": "mp4"
-            }
-            
-            download_response = self.session.post(f"{API_BASE}/download", json=payload)
+            download_response = await self.client.post(URL_DOWNLOAD, content=FILE_DL_BODY, headers=JSON_HEADERS)
             
             if download_response.status_code == 200:
-                data = download_response.json()
+                data = self._json(download_response)
                 video_id = data.get("video_id")
                 
                 if video_id:
-                    # Wait a bit for download to potentially complete
-                    time.sleep(5)
+                    # Try to access the file, giving the download up to 5 s to complete.
+                    # Only the status matters, so never pull the video body.
+                    file_url = f"/download/{video_id}/file"
+                    file_status = None
                     
-                    # Try to access the file
-                    file_response = self.session.get(f"{API_BASE}/download/{video_id}/file")
+                    async def file_available():
+                        nonlocal file_status
+                        response = await self.client.head(file_url)
+                        if response.status_code == 405:
+                            # Backend without HEAD support: stream and drop the body
+                            async with self.client.stream("GET", file_url) as response:
+                                pass
+                        file_status = response.status_code
+                        return file_status != 404
                     
-                    if file_response.status_code == 200:
+                    await self._wait_for(file_available, timeout=5)
+                    
+                    if file_status == 200:
                         self.log_test("File Serving", True, f"File served successfully for {video_id}")
                         return True
-                    elif file_response.status_code == 404:
+                    elif file_status == 404:
                         self.log_test("File Serving", True, "File not found (expected if download not complete)")
                         return True
                     else:
-                        self.log_test("File Serving", False, f"Status: {file_response.status_code}")
+                        self.log_test("File Serving", False, f"Status: {file_status}")
                         return False
                 else:
                     self.log_test("File Serving", False, "No video ID returned from download")
@@ -314,66 +439,112 @@ class BackendTester:
             self.log_test("File Serving", False, f"Exception: {str(e)}")
             return False
     
+    async def _ws_listener(self):
+        """Hold one WebSocket open for the whole run and record every message"""
+        ws_url = f"{BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://')}/api/ws"
+        try:
+            async with websockets.connect(ws_url, ping_interval=20) as websocket:
+                async for message in websocket:
+                    # Large messages are sent zlib-compressed
+                    if isinstance(message, bytes) and message[:1] == b'\x78':
+                        message = zlib.decompress(message)
+                    async with self.ws_condition:
+                        self.ws_messages.append(orjson.loads(message))
+                        self.ws_condition.notify_all()
+        except Exception as e:
+            self.ws_error = e
+        finally:
+            async with self.ws_condition:
+                self.ws_done = True
+                self.ws_condition.notify_all()
+    
+    async def _wait_for_ws(self, predicate, timeout=10):
+        """Return the first WebSocket message matching predicate, or None on timeout or disconnect"""
+        def find():
+            return next((m for m in self.ws_messages if predicate(m)), None)
+        
+        async with self.ws_condition:
+            try:
+                await asyncio.wait_for(
+                    self.ws_condition.wait_for(lambda: self.ws_done or find() is not None),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                pass
+            return find()
+    
     async def test_websocket(self):
         """Test WebSocket endpoint"""
         try:
-            ws_url = f"{BACKEND_URL.replace('https://', 'wss://').replace('http://', 'ws://')}/api/ws"
+            # Wait for the shared listener's first message
+            data = await self._wait_for_ws(lambda m: True)
             
-            async with websockets.connect(ws_url) as websocket:
-                # Wait for a message
-                message = await asyncio.wait_for(websocket.recv(), timeout=10)
-                data = json.loads(message)
-                
-                if "type" in data and "stats" in data:
-                    self.log_test("WebSocket Connection", True, f"Received: {data['type']}")
-                    return True
+            if data is None:
+                if self.ws_error:
+                    self.log_test("WebSocket Connection", False, f"Exception: {str(self.ws_error)}")
                 else:
-                    self.log_test("WebSocket Connection", False, f"Invalid message: {data}")
-                    return False
-                    
-        except asyncio.TimeoutError:
-            self.log_test("WebSocket Connection", False, "Timeout waiting for message")
-            return False
+                    self.log_test("WebSocket Connection", False, "Timeout waiting for message")
+                return False
+            elif "type" in data and "stats" in data:
+                self.log_test("WebSocket Connection", True, f"Received: {data['type']}")
+                return True
+            else:
+                self.log_test("WebSocket Connection", False, f"Invalid message: {data}")
+                return False
+                
         except Exception as e:
             self.log_test("WebSocket Connection", False, f"Exception: {str(e)}")
             return False
     
-    def run_websocket_test(self):
-        """Run WebSocket test in event loop"""
+    async def run_test(self, test_name, test_func):
+        """Run one test, turning unexpected errors into a failure"""
+        print(f"\n🧪 Testing {test_name}...")
         try:
-            return asyncio.run(self.test_websocket())
+            return bool(await test_func())
         except Exception as e:
-            self.log_test("WebSocket Connection", False, f"Event loop error: {str(e)}")
+            self.log_test(test_name, False, f"Unexpected error: {str(e)}")
             return False
     
-    def run_all_tests(self):
+    async def run_all_tests(self):
         """Run all backend tests"""
         print(f"🚀 Starting StreamVault Backend API Tests")
         print(f"📡 Backend URL: {BACKEND_URL}")
         print("=" * 60)
         
-        tests = [
-            ("API Health", self.test_api_health),
-            ("URL Analysis", self.test_url_analysis),
-            ("Single Download", self.test_single_download),
-            ("Bulk Download", self.test_bulk_download),
-            ("Playlist Download", self.test_playlist_download),
-            ("Statistics", self.test_statistics),
-            ("Download Management", self.test_download_management),
-            ("File Serving", self.test_file_serving),
-            ("WebSocket", self.run_websocket_test),
+        # Stages run in order; tests within a stage don't depend on each other and run concurrently
+        stages = [
+            [
+                ("API Health", self.test_api_health),
+                ("URL Analysis", self.test_url_analysis),
+                ("Statistics", self.test_statistics),
+                ("Get Downloads", self.test_get_downloads),
+                ("Get Active Downloads", self.test_get_active_downloads),
+                ("WebSocket", self.test_websocket),
+            ],
+            [("Single Download", self.test_single_download)],
+            [
+                ("Bulk Download", self.test_bulk_download),
+                ("Playlist Download", self.test_playlist_download),
+                ("File Serving", self.test_file_serving),
+                ("Delete Download", self.test_delete_download),
+            ],
+            # Clears history, so it runs after everything that creates downloads
+            [("Download Management", self.test_download_management)],
         ]
         
-        passed = 0
-        total = len(tests)
+        total = sum(len(stage) for stage in stages)
+        # One WebSocket, opened up front, serves every test that watches live updates
+        self.ws_condition = asyncio.Condition()
+        listener = asyncio.create_task(self._ws_listener())
         
-        for test_name, test_func in tests:
-            print(f"\n🧪 Testing {test_name}...")
-            try:
-                if test_func():
-                    passed += 1
-            except Exception as e:
-                self.log_test(test_name, False, f"Unexpected error: {str(e)}")
+        results = []
+        try:
+            for stage in stages:
+                results += await asyncio.gather(*[self.run_test(name, func) for name, func in stage])
+        finally:
+            listener.cancel()
+            await self.client.aclose()
+        passed = sum(results)
         
         print("\n" + "=" * 60)
         print(f"📊 Test Results: {passed}/{total} tests passed")
@@ -387,5 +558,5 @@ class BackendTester:
 
 if __name__ == "__main__":
     tester = BackendTester()
-    success = tester.run_all_tests()
+    success = asyncio.run(tester.run_all_tests())
     exit(0 if success else 1)
\ No newline at end of file
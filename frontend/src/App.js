@@ -41,20 +41,48 @@ function App() {
   useEffect(() => {
     const wsUrl = BACKEND_URL.replace('http', 'ws') + '/api/ws';
     const ws = new WebSocket(wsUrl);
+    ws.binaryType = 'arraybuffer';
+    const decoder = new TextDecoder();
     
-    ws.onmessage = (event) => {
-      const data = JSON.parse(event.data);
-      if (data.type === 'stats_update') {
+    // Large messages arrive zlib-compressed (first byte 0x78 rather than '{')
+    const decode = async (buffer) => {
+      if (new Uint8Array(buffer)[0] === 0x78) {
+        const stream = new Blob([buffer]).stream().pipeThrough(new DecompressionStream('deflate'));
+        buffer = await new Response(stream).arrayBuffer();
+      }
+      return JSON.parse(decoder.decode(buffer));
+    };
+    
+    const handleMessage = (data) => {
+      if (data.type === 'snapshot') {
+        // Sent on connect and whenever we fell behind: the full active set
         setStats(data.stats);
-        if (data.active_downloads) {
-          setDownloads(prev => {
-            const updated = { ...data.active_downloads };
-            return Object.values(updated);
-          });
-        }
+        setDownloads(Object.values(data.active_downloads));
+      } else if (data.type === 'delta') {
+        setStats(data.stats);
+        setDownloads(prev => {
+          const changed = { ...data.active_downloads };
+          const removed = new Set(data.removed || []);
+          const merged = prev
+            .filter(d => !removed.has(d.id))
+            .map(d => {
+              const update = changed[d.id];
+              delete changed[d.id];
+              return update ? { ...d, ...update } : d;
+            });
+          return [...Object.values(changed), ...merged];
+        });
       }
     };
     
+    // Decompression is async, so chain messages to apply them in arrival order
+    let pending = Promise.resolve();
+    ws.onmessage = (event) => {
+      pending = pending.then(() => decode(event.data)).then(handleMessage).catch(error => {
+        console.error('Error handling WebSocket message:', error);
+      });
+    };
+    
     ws.onclose = () => {
       console.log('WebSocket connection closed');
     };
@@ -70,8 +98,12 @@ function App() {
 
   const loadDownloads = async () => {
     try {
-      const response = await axios.get(`${API}/downloads`);
-      setDownloads(response.data);
+      const [history, active] = await Promise.all([
+        axios.get(`${API}/downloads`),
+        axios.get(`${API}/downloads/active`)
+      ]);
+      // Overlay live status onto the persisted records
+      setDownloads(history.data.map(d => ({ ...d, ...active.data[d.id] })));
     } catch (error) {
       console.error('Error loading downloads:', error);
     }